@@ -0,0 +1,312 @@
+"""
+Module for year-over-year change detection on risk factor sections (Item 1A).
+
+Each section is split into sentences, sentences are shingled into word n-grams and
+summarised by MinHash signatures. Locality-sensitive hashing (banding) is then used to
+match sentences of year t against year t-1 for the same ticker without comparing every pair, which keeps the stage
+near-linear in the size of the corpus.
+
+Paragraphs are blank-line blocks when present; preprocessed filings have their whitespace
+collapsed, so there paragraphs are rebuilt as groups of consecutive sentences. Sentences
+are matched individually and their statuses are then aggregated per paragraph, so inserting or deleting a sentence only affects the paragraph
+that contains it rather than shifting every later paragraph boundary.
+"""
+import os
+import re
+import json
+import zlib
+import numpy as np
+import pandas as pd
+
+from collections import defaultdict
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_INPUT_FILE  = os.path.join(project_root, "data", "processed", "reports.parquet")
+DEFAULT_OUTPUT_FILE = os.path.join(project_root, "data", "processed", "change_features.parquet")
+DEFAULT_CONFIG_FILE = os.path.join(project_root, "models", "change_detection.json")
+
+# Mersenne prime used for the universal hash family (a * x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+CHANGE_FEATURES = [
+    'risk_n_paragraphs',
+    'risk_similarity',
+    'risk_matched_ratio',
+    'risk_edited_ratio',
+    'risk_new_ratio',
+    'risk_new_count',
+    'risk_removed_ratio',
+]
+
+
+def candidate_probability(similarity: float, bands: int, rows: int) -> float:
+    """
+    Probability that two sentences with the given Jaccard similarity share at least one LSH bucket.
+    """
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+class RiskFactorChangeDetector:
+    """
+    Detects matched, edited and new risk paragraphs between consecutive 10-Ks of a ticker.
+
+    Units are only compared when they collide in an LSH band, so a pair at the edit
+    threshold is missed with probability (1 - s^rows)^bands (see false_negative_rate).
+    When bands is not given, the largest rows-per-band keeping that rate below
+    max_false_negative is chosen (64 bands of 2 rows for the defaults, ~0.2% at s=0.3).
+
+    :param input_file: Path to Parquet with columns ['filing_id', 'ticker', 'year', 'item1a']
+    :param output_file: Path to write the change features keyed by filing_id
+    :param num_perm: number of MinHash permutations (signature length)
+    :param bands: number of LSH bands; must divide num_perm (derived from edit_threshold by default)
+    :param shingle_size: number of words per shingle
+    :param sentences_per_paragraph: sentences grouped into one paragraph when the text has no line breaks
+    :param match_threshold: estimated Jaccard similarity above which a sentence is considered unchanged
+    :param edit_threshold: estimated Jaccard similarity above which a sentence is considered edited
+    :param max_false_negative: highest accepted probability of missing a pair at edit_threshold
+    """
+    def __init__(self,
+                 input_file: str = DEFAULT_INPUT_FILE,
+                 output_file: str = DEFAULT_OUTPUT_FILE,
+                 num_perm: int = 128,
+                 bands: int = None,
+                 shingle_size: int = 5,
+                 sentences_per_paragraph: int = 5,
+                 match_threshold: float = 0.8,
+                 edit_threshold: float = 0.3,
+                 max_false_negative: float = 0.05,
+                 seed: int = 42):
+        if not 0 < edit_threshold <= match_threshold <= 1:
+            raise ValueError("Thresholds must satisfy 0 < edit_threshold <= match_threshold <= 1")
+        self.input_file = input_file
+        self.output_file = output_file
+        self.num_perm = num_perm
+        self.bands = bands or self._derive_bands(num_perm, edit_threshold, max_false_negative)
+        if num_perm % self.bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({self.bands})")
+        self.rows = num_perm // self.bands
+        self.shingle_size = shingle_size
+        self.sentences_per_paragraph = sentences_per_paragraph
+        self.match_threshold = match_threshold
+        self.edit_threshold = edit_threshold
+        self.max_false_negative = max_false_negative
+        self.seed = seed
+        self.false_negative_rate = 1.0 - candidate_probability(edit_threshold, self.bands, self.rows)
+        if self.false_negative_rate > max_false_negative:
+            raise ValueError(
+                f"{self.bands} bands of {self.rows} rows miss {self.false_negative_rate:.1%} of pairs at "
+                f"edit_threshold={edit_threshold}; use more bands or a higher edit_threshold"
+            )
+        # Hash family parameters, drawn once so signatures are comparable across filings
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm).astype(np.uint64)
+
+    def config(self) -> dict:
+        """
+        Settings that determine the change features (everything except file paths).
+        """
+        return {
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'shingle_size': self.shingle_size,
+            'sentences_per_paragraph': self.sentences_per_paragraph,
+            'match_threshold': self.match_threshold,
+            'edit_threshold': self.edit_threshold,
+            'max_false_negative': self.max_false_negative,
+            'seed': self.seed,
+        }
+
+    def save_config(self, path: str = DEFAULT_CONFIG_FILE) -> None:
+        """
+        Persists the detector settings so new filings are scored exactly like the training rows.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.config(), f, indent=2)
+        print(f"[✓] Saved change detection config to {path}")
+
+    @classmethod
+    def load_config(cls, path: str = DEFAULT_CONFIG_FILE, **kwargs) -> "RiskFactorChangeDetector":
+        """
+        Restores a detector saved with save_config(); kwargs override file paths.
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(**config, **kwargs)
+
+    @staticmethod
+    def _derive_bands(num_perm: int, threshold: float, max_false_negative: float) -> int:
+        """
+        Picks the fewest bands (most rows per band, fewest spurious candidates) that still
+        make a pair at the threshold a candidate with probability >= 1 - max_false_negative.
+        """
+        for rows in range(num_perm, 0, -1):
+            if num_perm % rows == 0:
+                bands = num_perm // rows
+                if 1.0 - candidate_probability(threshold, bands, rows) <= max_false_negative:
+                    return bands
+        return num_perm
+
+    def _split_units(self, text: str) -> tuple[list[str], np.ndarray]:
+        """
+        Splits a section into sentences and returns them with the paragraph index of each sentence.
+        Paragraphs are blank-line blocks when the text has them, otherwise groups of
+        sentences_per_paragraph consecutive sentences. Matching is always done on sentences,
+        so both sides of a comparison use the same unit size whatever their layout.
+        """
+        text = text.strip() if isinstance(text, str) else ''
+        blocks = [b for b in re.split(r"\n\s*\n", text) if re.search(r"\w", b)]
+        sentences, paragraph = [], []
+        for block_idx, block in enumerate(blocks):
+            for sentence in re.split(r"(?<=[.!?])\s+(?=[A-Z])", block.strip()):
+                if re.search(r"\w", sentence):
+                    sentences.append(sentence)
+                    paragraph.append(block_idx)
+        if len(blocks) > 1:
+            return sentences, np.array(paragraph, dtype=np.int64)
+        return sentences, np.arange(len(sentences)) // self.sentences_per_paragraph
+
+    def _shingles(self, unit: str) -> np.ndarray:
+        """
+        Hashes the word n-gram shingles of a sentence to 32-bit integers.
+        """
+        tokens = [m.group(0).lower() for m in re.finditer(r"\w+", unit)]
+        k = min(self.shingle_size, len(tokens))
+        if k == 0:
+            return np.empty(0, dtype=np.uint64)
+        grams = {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+        # crc32 rather than hash() so signatures are stable across processes
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                           dtype=np.uint64, count=len(grams))
+
+    def signatures(self, units: list[str]) -> np.ndarray:
+        """
+        Computes MinHash signatures, one row of length num_perm per sentence.
+        """
+        sigs = np.full((len(units), self.num_perm), _MERSENNE_PRIME, dtype=np.uint64)
+        for i, unit in enumerate(units):
+            shingles = self._shingles(unit)
+            if shingles.size == 0:
+                continue
+            shingles %= _MERSENNE_PRIME
+            hashed = (np.outer(self._a, shingles) + self._b[:, None]) % _MERSENNE_PRIME
+            sigs[i] = hashed.min(axis=1)
+        return sigs
+
+    def _band_keys(self, sigs: np.ndarray) -> list[list[bytes]]:
+        """
+        Splits each signature into bands and returns the hashable bucket key of every band.
+        """
+        return [[sig[j * self.rows:(j + 1) * self.rows].tobytes() for j in range(self.bands)]
+                for sig in sigs]
+
+    def _match_units(self, current: list[str], previous: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds, for each current sentence, its most similar previous sentence among LSH candidates.
+        Returns the best similarity per current sentence and a mask of previous sentences that were
+        matched at least at edit_threshold.
+        """
+        sig_cur = self.signatures(current)
+        sig_prev = self.signatures(previous)
+
+        # Index previous sentences by LSH bucket
+        buckets = defaultdict(list)
+        for idx, keys in enumerate(self._band_keys(sig_prev)):
+            for band, key in enumerate(keys):
+                buckets[(band, key)].append(idx)
+
+        best_sims = np.zeros(len(current))
+        prev_hit = np.zeros(len(previous), dtype=bool)
+        for i, keys in enumerate(self._band_keys(sig_cur)):
+            candidates = {idx for band, key in enumerate(keys) for idx in buckets.get((band, key), ())}
+            if not candidates:
+                continue
+            candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            # Estimated Jaccard similarity = share of equal MinHash values
+            sims = (sig_prev[candidates] == sig_cur[i]).mean(axis=1)
+            best = int(sims.argmax())
+            best_sims[i] = sims[best]
+            if sims[best] >= self.edit_threshold:
+                prev_hit[candidates[best]] = True
+        return best_sims, prev_hit
+
+    def compare(self, current: str, previous: str) -> dict:
+        """
+        Matches the current section against the previous one and returns its change features.
+
+        Paragraph statuses are aggregated from their sentences: matched when every sentence is
+        matched, new when more than half of the sentences have no counterpart, edited otherwise.
+        A previous paragraph counts as removed when none of its sentences was matched.
+        """
+        cur_units, cur_para = self._split_units(current)
+        prev_units, prev_para = self._split_units(previous)
+        n_paragraphs = int(cur_para.max()) + 1 if cur_units else 0
+        features = {'risk_n_paragraphs': n_paragraphs}
+        if not cur_units or not prev_units:
+            features.update({name: np.nan for name in CHANGE_FEATURES[1:]})
+            return features
+
+        best_sims, prev_hit = self._match_units(cur_units, prev_units)
+        unit_matched = best_sims >= self.match_threshold
+        unit_new = best_sims < self.edit_threshold
+
+        counts = np.bincount(cur_para, minlength=n_paragraphs)
+        similarity = np.bincount(cur_para, weights=best_sims, minlength=n_paragraphs) / counts
+        matched = np.bincount(cur_para, weights=unit_matched, minlength=n_paragraphs) == counts
+        new = np.bincount(cur_para, weights=unit_new, minlength=n_paragraphs) > counts / 2
+        edited = ~matched & ~new
+        prev_kept = np.bincount(prev_para, weights=prev_hit) > 0
+
+        features.update({
+            'risk_similarity': float(similarity.mean()),
+            'risk_matched_ratio': float(matched.mean()),
+            'risk_edited_ratio': float(edited.mean()),
+            'risk_new_ratio': float(new.mean()),
+            'risk_new_count': int(new.sum()),
+            'risk_removed_ratio': float(1.0 - prev_kept.mean()),
+        })
+        return features
+
+    def transform(self, df: pd.DataFrame = None) -> pd.DataFrame:
+        """
+        Computes change features for every filing against the filing of the same ticker for the
+        previous year. Filings without a year t-1 filing get NaN similarity features.
+        Columns: filing_id, ticker, year, risk_*
+        """
+        if df is None:
+            df = pd.read_parquet(self.input_file)
+        df = df.sort_values(['ticker', 'year'])
+        records = []
+        for ticker, group in df.groupby('ticker', sort=False):
+            # item1a of the first filing seen for each year of this ticker
+            by_year = {}
+            for _, row in group.iterrows():
+                year = int(row['year'])
+                # Null sections are read back from Parquet as NaN/None
+                current = row.get('item1a')
+                current = current if isinstance(current, str) else ''
+                feats = self.compare(current, by_year.get(year - 1, ''))
+                records.append({
+                    'filing_id': row['filing_id'],
+                    'ticker': ticker,
+                    'year': row['year'],
+                    **feats,
+                })
+                by_year.setdefault(year, current)
+        return pd.DataFrame(records, columns=['filing_id', 'ticker', 'year'] + CHANGE_FEATURES)
+
+    def save(self) -> None:
+        """
+        Computes change features and saves them to the output file.
+        """
+        os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+        df_change = self.transform()
+        df_change.to_parquet(self.output_file, index=False)
+        print(f"Saved change features to {self.output_file}")
+
+
+if __name__ == "__main__":
+    detector = RiskFactorChangeDetector()
+    detector.save()
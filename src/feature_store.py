@@ -0,0 +1,280 @@
+"""
+Module for storing aligned feature groups keyed by filing_id.
+
+Each saved version is a directory holding one sub-directory per feature group:
+dense groups (linguistic, change, embedding features) are stored as a single .npy
+matrix and sparse groups (TF-IDF) as the CSR components (data, indices, indptr).
+Arrays are memory-mapped on load, so retrieving a whole group does not copy it.
+
+Layout::
+
+    data/features/
+        v0001/
+            manifest.json      # version, filing_ids, groups (kind, shape, columns)
+            linguistic/values.npy
+            tfidf/data.npy, tfidf/indices.npy, tfidf/indptr.npy
+            embedding/values.npy
+"""
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from datetime import datetime
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_PROCESSED_DIR  = os.path.join(project_root, "data", "processed")
+DEFAULT_STORE_DIR      = os.path.join(project_root, "data", "features")
+DEFAULT_FEATURES_FILE  = os.path.join(DEFAULT_PROCESSED_DIR, "reports_features.parquet")
+DEFAULT_TFIDF_FILE     = os.path.join(DEFAULT_PROCESSED_DIR, "tfidf_features.parquet")
+DEFAULT_EMBED_FILE     = os.path.join(DEFAULT_PROCESSED_DIR, "embedding_features.parquet")
+DEFAULT_CHANGE_FILE    = os.path.join(DEFAULT_PROCESSED_DIR, "change_features.parquet")
+
+LINGUISTIC_FEATURES = ['hedge_ratio', 'fog_index', 'passive_ratio', 'lexical_diversity']
+# Column order of the groups written by build_from_processed()
+FEATURE_GROUPS = ['linguistic', 'change', 'tfidf', 'embedding']
+
+
+class FeatureStore:
+    """
+    Versioned store of dense and sparse feature groups aligned on filing_id.
+
+    :param store_dir: Root directory containing one sub-directory per version
+    """
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self._manifests = {}
+
+    def versions(self) -> list[int]:
+        """
+        Lists the versions available in the store, oldest first.
+        """
+        if not os.path.isdir(self.store_dir):
+            return []
+        found = []
+        for name in os.listdir(self.store_dir):
+            if name.startswith("v") and name[1:].isdigit() \
+                    and os.path.exists(os.path.join(self.store_dir, name, "manifest.json")):
+                found.append(int(name[1:]))
+        return sorted(found)
+
+    def _version_dir(self, version: int) -> str:
+        return os.path.join(self.store_dir, f"v{version:04d}")
+
+    def _resolve_version(self, version: int = None) -> int:
+        available = self.versions()
+        if not available:
+            raise FileNotFoundError(f"No feature store version found in {self.store_dir}")
+        if version is None:
+            return available[-1]
+        if version not in available:
+            raise ValueError(f"Unknown feature store version {version}; available: {available}")
+        return version
+
+    def manifest(self, version: int = None) -> dict:
+        """
+        Returns the manifest of a version (latest by default).
+        """
+        version = self._resolve_version(version)
+        if version not in self._manifests:
+            path = os.path.join(self._version_dir(version), "manifest.json")
+            with open(path, encoding="utf-8") as f:
+                self._manifests[version] = json.load(f)
+        return self._manifests[version]
+
+    def save(self, filing_ids, groups: dict, columns: dict = None) -> int:
+        """
+        Writes feature groups as a new version and returns its number.
+
+        :param filing_ids: Row keys, shared by all groups
+        :param groups: Mapping group name -> pd.DataFrame, np.ndarray or scipy.sparse matrix,
+                       with rows in the same order as filing_ids
+        :param columns: Optional mapping group name -> column names (required for non-DataFrame groups)
+        """
+        filing_ids = [str(f) for f in filing_ids]
+        if len(set(filing_ids)) != len(filing_ids):
+            raise ValueError("filing_ids must be unique")
+        columns = columns or {}
+
+        # Validate every group before touching the disk
+        prepared = {}
+        for name, values in groups.items():
+            if isinstance(values, pd.DataFrame):
+                cols = [str(c) for c in values.columns]
+                values = values.to_numpy()
+            else:
+                if name not in columns:
+                    raise ValueError(f"Column names required for group '{name}'")
+                cols = [str(c) for c in columns[name]]
+            if values.shape != (len(filing_ids), len(cols)):
+                raise ValueError(
+                    f"Group '{name}' has shape {values.shape}, expected ({len(filing_ids)}, {len(cols)})"
+                )
+            prepared[name] = (values, cols)
+
+        available = self.versions()
+        version = available[-1] + 1 if available else 1
+        version_dir = self._version_dir(version)
+        manifest = {
+            "version": version,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "filing_ids": filing_ids,
+            "groups": {},
+        }
+
+        # Write into a temporary directory and move it into place once complete,
+        # so a failed save never leaves a partial version behind
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".v{version:04d}-", dir=self.store_dir)
+        try:
+            for name, (values, cols) in prepared.items():
+                group_dir = os.path.join(tmp_dir, name)
+                os.makedirs(group_dir)
+                if sp.issparse(values):
+                    values = sp.csr_matrix(values)
+                    values.sort_indices()
+                    np.save(os.path.join(group_dir, "data.npy"), values.data)
+                    np.save(os.path.join(group_dir, "indices.npy"), values.indices)
+                    np.save(os.path.join(group_dir, "indptr.npy"), values.indptr)
+                    kind = "sparse"
+                else:
+                    np.save(os.path.join(group_dir, "values.npy"), np.ascontiguousarray(values))
+                    kind = "dense"
+                manifest["groups"][name] = {
+                    "kind": kind,
+                    "dtype": str(values.dtype),
+                    "shape": list(values.shape),
+                    "columns": cols,
+                }
+
+            with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_dir, version_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        print(f"[✓] Saved feature store version {version} to {version_dir}")
+        return version
+
+    def _load_group(self, version: int, name: str):
+        """
+        Memory-maps a stored group without copying it.
+        """
+        info = self.manifest(version)["groups"][name]
+        group_dir = os.path.join(self._version_dir(version), name)
+        if info["kind"] == "sparse":
+            data = np.load(os.path.join(group_dir, "data.npy"), mmap_mode="r")
+            indices = np.load(os.path.join(group_dir, "indices.npy"), mmap_mode="r")
+            indptr = np.load(os.path.join(group_dir, "indptr.npy"), mmap_mode="r")
+            return sp.csr_matrix((data, indices, indptr), shape=tuple(info["shape"]), copy=False)
+        return np.load(os.path.join(group_dir, "values.npy"), mmap_mode="r")
+
+    def load(self, groups: list[str] = None, filing_ids: list[str] = None,
+             version: int = None) -> tuple:
+        """
+        Retrieves a subset of feature groups and rows as a single matrix.
+
+        Returns a np.ndarray when every requested group is dense, otherwise a
+        scipy.sparse.csr_matrix. A single group requested for all rows is returned
+        as a memory-mapped view (no copy).
+
+        :param groups: Group names to retrieve, in column order (all groups by default)
+        :param filing_ids: Rows to retrieve, in row order (all rows by default)
+        :param version: Store version (latest by default)
+        :return: (matrix, column names, filing_ids)
+        """
+        version = self._resolve_version(version)
+        manifest = self.manifest(version)
+        groups = list(manifest["groups"]) if groups is None else list(groups)
+        unknown = [g for g in groups if g not in manifest["groups"]]
+        if unknown:
+            raise ValueError(f"Unknown feature groups {unknown}; available: {list(manifest['groups'])}")
+
+        rows = None
+        stored_ids = manifest["filing_ids"]
+        if filing_ids is not None:
+            position = {fid: i for i, fid in enumerate(stored_ids)}
+            missing = [f for f in filing_ids if f not in position]
+            if missing:
+                raise KeyError(f"filing_ids not in feature store: {missing}")
+            rows = np.array([position[f] for f in filing_ids], dtype=np.int64)
+            stored_ids = list(filing_ids)
+
+        blocks, columns = [], []
+        for name in groups:
+            block = self._load_group(version, name)
+            if rows is not None:
+                block = block[rows]
+            blocks.append(block)
+            columns.extend(f"{name}:{c}" for c in manifest["groups"][name]["columns"])
+
+        if len(blocks) == 1:
+            matrix = blocks[0]
+        elif any(sp.issparse(b) for b in blocks):
+            matrix = sp.hstack(blocks, format="csr")
+        else:
+            matrix = np.hstack(blocks)
+        return matrix, columns, list(stored_ids)
+
+    @staticmethod
+    def _align(df_part: pd.DataFrame, filing_ids: list[str], index: pd.Index, source: str) -> pd.DataFrame:
+        """
+        Reorders a feature file so row i belongs to filing_ids[i].
+        Raises ValueError when the rows do not cover exactly the same filings.
+        """
+        if df_part.index.name == "filing_id":
+            keys = df_part.index.astype(str)
+            if keys.has_duplicates or set(keys) != set(filing_ids):
+                raise ValueError(f"{source} does not hold exactly one row per filing_id of the features file")
+            return df_part.set_axis(keys, axis=0).loc[filing_ids]
+        # Legacy files without filing_id: only accept an identical positional index
+        if len(df_part) != len(index) or not df_part.index.equals(index):
+            raise ValueError(
+                f"{source} has no filing_id index and its rows do not match the features file; "
+                f"re-save it with filing_ids"
+            )
+        return df_part
+
+    def build_from_processed(self,
+                             features_file: str = DEFAULT_FEATURES_FILE,
+                             tfidf_file: str = DEFAULT_TFIDF_FILE,
+                             embed_file: str = DEFAULT_EMBED_FILE,
+                             change_file: str = DEFAULT_CHANGE_FILE) -> int:
+        """
+        Assembles the Parquet outputs of the pipeline into a new store version.
+        Every file is joined on filing_id; TF-IDF and embedding files saved without
+        filing_ids must have exactly the same index as the features file.
+        """
+        df = pd.read_parquet(features_file)
+        filing_ids = df["filing_id"].astype(str).tolist()
+        groups = {"linguistic": df[LINGUISTIC_FEATURES].astype(np.float64)}
+
+        if not os.path.exists(change_file):
+            print(f"[!] {change_file} not found, building the store without the 'change' group "
+                  f"(run RiskFactorChangeDetector first)")
+        else:
+            df_change = pd.read_parquet(change_file).set_index("filing_id")
+            df_change = self._align(df_change, filing_ids, df.index, change_file)
+            change_cols = [c for c in df_change.columns if c.startswith("risk_")]
+            groups["change"] = df_change[change_cols].astype(np.float64)
+
+        if os.path.exists(tfidf_file):
+            df_tfidf = self._align(pd.read_parquet(tfidf_file), filing_ids, df.index, tfidf_file)
+            groups["tfidf"] = sp.csr_matrix(df_tfidf.to_numpy())
+            tfidf_columns = list(df_tfidf.columns)
+        else:
+            tfidf_columns = []
+
+        if os.path.exists(embed_file):
+            groups["embedding"] = self._align(pd.read_parquet(embed_file), filing_ids, df.index, embed_file)
+
+        return self.save(filing_ids, groups, columns={"tfidf": tfidf_columns})
+
+
+if __name__ == "__main__":
+    store = FeatureStore()
+    store.build_from_processed()
@@ -18,6 +18,21 @@ DEFAULT_INPUT_FILE  = os.path.join(project_root, "data", "processed", "reports_w
 DEFAULT_OUTPUT_FILE = os.path.join(project_root, "data", "processed", "reports_features.parquet")
 
 
+def section_text(sections, require_item1a: bool = False) -> str:
+    """
+    Selects the text features are computed on: Item 1A (Risk Factors), else Item 1 + Item 7.
+
+    :param sections: Mapping (or DataFrame row) with 'item1', 'item1a' and 'item7'
+    :param require_item1a: raise ValueError instead of falling back when Item 1A is missing
+    """
+    item1a = sections.get('item1a', '') or ''
+    if item1a.strip():
+        return item1a
+    if require_item1a:
+        raise ValueError("No Item 1A (Risk Factors) section found")
+    return (sections.get('item1', '') or '') + ' ' + (sections.get('item7', '') or '')
+
+
 class FeatureEngineer:
     """
     Extracts linguistic features from report sections and saves enriched DataFrame.
@@ -60,11 +75,10 @@ class FeatureEngineer:
         except Exception:
             return np.nan
 
-    def _passive_ratio(self, text: str) -> float:
+    def _passive_ratio(self, doc) -> float:
         """
-        Ratio of passive constructions ("by" + past participle) to sentences.
+        Ratio of passive constructions ("by" + past participle) to sentences of a parsed SpaCy doc.
         """
-        doc = self.nlp(text)
         sentences = list(doc.sents)
         if not sentences:
             return 0.0
@@ -85,27 +99,34 @@ class FeatureEngineer:
             return 0.0
         return len(set(tokens)) / len(tokens)
 
-    def transform(self) -> pd.DataFrame:
+    def compute_batch(self, texts: list[str], batch_size: int = 8) -> list[dict]:
         """
-        Loads input, computes features, and returns enriched DataFrame.
+        Computes all linguistic features for a list of texts, parsing them with nlp.pipe.
         """
-        df = pd.read_parquet(self.input_file)
-        # Prepare columns
         features = []
-        for _, row in df.iterrows():
-            # Choose section for features (e.g., item1a Risk Factors)
-            text = row.get('item1a', '') or row.get('item1', '') + ' ' + row.get('item7', '')
-            hedge = self._hedge_ratio(text)
-            fog   = self._fog_index(text)
-            passive = self._passive_ratio(text)
-            lexdiv = self._lexical_diversity(text)
+        for text, doc in zip(texts, self.nlp.pipe(texts, batch_size=batch_size)):
             features.append({
-                'hedge_ratio': hedge,
-                'fog_index': fog,
-                'passive_ratio': passive,
-                'lexical_diversity': lexdiv
+                'hedge_ratio': self._hedge_ratio(text),
+                'fog_index': self._fog_index(text),
+                'passive_ratio': self._passive_ratio(doc),
+                'lexical_diversity': self._lexical_diversity(text)
             })
-        feat_df = pd.DataFrame(features, index=df.index)
+        return features
+
+    def compute(self, text: str) -> dict:
+        """
+        Computes all linguistic features for a single text.
+        """
+        return self.compute_batch([text])[0]
+
+    def transform(self) -> pd.DataFrame:
+        """
+        Loads input, computes features, and returns enriched DataFrame.
+        """
+        df = pd.read_parquet(self.input_file)
+        # Choose section for features (e.g., item1a Risk Factors)
+        texts = [section_text(row) for _, row in df.iterrows()]
+        feat_df = pd.DataFrame(self.compute_batch(texts), index=df.index)
         result = pd.concat([df, feat_df], axis=1)
         return result
 
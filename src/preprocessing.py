@@ -55,28 +55,40 @@ class Preprocessor:
         """
         return re.sub(r"\s+", " ", text).strip()
 
-    def preprocess_file(self, filename: str) -> None:
-        raw_path = os.path.join(self.raw_dir, filename)
-        with open(raw_path, 'r', encoding='utf-8', errors='ignore') as f:
-            raw_content = f.read()
-
+    def extract_sections(self, raw_content: str) -> Dict[str, str]:
+        """
+        Cleans a raw 10-K and returns its 'item1', 'item1a' and 'item7' sections.
+        Returns an empty dict if the item markers are not found.
+        """
         # Extract between 2nd occurrence of Item 1. and 2nd occurrence of Item 8.
         extracted = self.extract_between_items(raw_content,
                                               r'Item\s+1\.',
                                               r'Item\s+8\.',
                                               occurrence=2)
         if not extracted:
-            print(f"[!] Occurrences not found or invalid order in {filename}, skipping.")
-            return
+            return {}
 
         # Clean and normalize
         clean = self.clean_html(extracted)
         clean = self.normalize_whitespace(clean)
 
         # Extract specific items
-        item_1 = self.extract_between_items(clean, r'Item\s+1\.', r'Item\s+1a\.', 1)
-        item_1a = self.extract_between_items(clean, r'Item\s+1a\.', r'Item\s+1b\.', 1)
-        item_7 = self.extract_between_items(clean, r'Item\s+7\.', r'Item\s+7a\.', 1)
+        return {
+            'item1': self.extract_between_items(clean, r'Item\s+1\.', r'Item\s+1a\.', 1),
+            'item1a': self.extract_between_items(clean, r'Item\s+1a\.', r'Item\s+1b\.', 1),
+            'item7': self.extract_between_items(clean, r'Item\s+7\.', r'Item\s+7a\.', 1),
+        }
+
+    def preprocess_file(self, filename: str) -> None:
+        raw_path = os.path.join(self.raw_dir, filename)
+        with open(raw_path, 'r', encoding='utf-8', errors='ignore') as f:
+            raw_content = f.read()
+
+        sections = self.extract_sections(raw_content)
+        if not sections:
+            print(f"[!] Occurrences not found or invalid order in {filename}, skipping.")
+            return
+        item_1, item_1a, item_7 = sections['item1'], sections['item1a'], sections['item7']
 
         final_text = f"{item_1}\n\n{item_1a}\n\n{item_7}"
 
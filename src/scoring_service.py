@@ -0,0 +1,340 @@
+"""
+Module for scoring new filings with persisted feature artifacts behind a local HTTP service.
+
+A single warm process loads the fitted TF-IDF vectorizer, the embedding model and the
+linguistic feature engineer once. Incoming filings are queued and grouped into
+micro-batches across concurrent requests, so spaCy, TF-IDF and the embedding model run on
+batches rather than one text at a time. Feature vectors are returned sparse, with the
+columns and group order of the latest FeatureStore version so they can be fed to models
+trained on FeatureStore.load().
+
+Usage::
+
+    python -m src.scoring_service --port 8000
+
+    curl -X POST localhost:8000/score -d '{"filing_id": "AAPL_10K_2025", "text": "<raw 10-K>",
+                                           "previous_text": "<raw 10-K of the prior year>"}'
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.change_detection import CHANGE_FEATURES, RiskFactorChangeDetector
+from src.feature_store import FEATURE_GROUPS, LINGUISTIC_FEATURES, FeatureStore
+from src.features import FeatureEngineer, section_text
+from src.preprocessing import Preprocessor
+from src.vectorization import TfidfFeatureExtractor, EmbeddingFeatureExtractor
+
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_ARTIFACTS_DIR = os.path.join(project_root, "models")
+TFIDF_ARTIFACT = "tfidf.joblib"
+EMBED_ARTIFACT = "embedding"
+CHANGE_ARTIFACT = "change_detection.json"
+
+
+class FeatureScorer:
+    """
+    Turns Item 1A texts into the full feature vector using saved artifacts only (no refitting).
+
+    Groups and columns follow the manifest of the feature store (latest version), so serving
+    and training vectors line up; without a store the default FEATURE_GROUPS order is used.
+    Change features need the prior-year Item 1A and are NaN without it, as for the first
+    filing of a ticker in the store. They use the detector settings saved with the artifacts.
+
+    :param artifacts_dir: Directory holding tfidf.joblib, change_detection.json and the embedding/ model
+    :param store: Feature store whose manifest defines the output columns
+    """
+    def __init__(self, artifacts_dir: str = DEFAULT_ARTIFACTS_DIR, store: FeatureStore = None):
+        self.artifacts_dir = artifacts_dir
+        self.engineer = FeatureEngineer()
+        change_config = os.path.join(artifacts_dir, CHANGE_ARTIFACT)
+        self.detector = (RiskFactorChangeDetector.load_config(change_config)
+                         if os.path.exists(change_config) else None)
+        self.tfidf = TfidfFeatureExtractor.load_model(os.path.join(artifacts_dir, TFIDF_ARTIFACT))
+        self.embedder = EmbeddingFeatureExtractor(model_name=os.path.join(artifacts_dir, EMBED_ARTIFACT),
+                                                  show_progress_bar=False)
+
+        produced = {
+            "linguistic": LINGUISTIC_FEATURES,
+            "change": CHANGE_FEATURES,
+            "tfidf": self.tfidf.feature_names(),
+            "embedding": [f"emb_{i+1}" for i in
+                          range(self.embedder.model.get_sentence_embedding_dimension())],
+        }
+        store = store or FeatureStore()
+        if store.versions():
+            manifest = store.manifest()
+            self.groups = list(manifest["groups"])
+            for name in self.groups:
+                expected = manifest["groups"][name]["columns"]
+                if produced.get(name) != expected:
+                    raise ValueError(
+                        f"Artifacts in {artifacts_dir} do not produce the '{name}' columns of "
+                        f"feature store version {manifest['version']}"
+                    )
+        else:
+            self.groups = list(FEATURE_GROUPS)
+        if "change" in self.groups and self.detector is None:
+            raise FileNotFoundError(
+                f"{change_config} not found; save it with RiskFactorChangeDetector.save_config() "
+                f"when building the change features"
+            )
+        self.columns = [f"{name}:{c}" for name in self.groups for c in produced[name]]
+
+    @staticmethod
+    def save_artifacts(tfidf: TfidfFeatureExtractor,
+                       embedder: EmbeddingFeatureExtractor,
+                       detector: RiskFactorChangeDetector,
+                       artifacts_dir: str = DEFAULT_ARTIFACTS_DIR) -> None:
+        """
+        Persists a fitted TF-IDF extractor, an embedding model and the change detector settings
+        for later scoring. The default paths of save_model()/save_config() already point here.
+        """
+        tfidf.save_model(os.path.join(artifacts_dir, TFIDF_ARTIFACT))
+        embedder.save_model(os.path.join(artifacts_dir, EMBED_ARTIFACT))
+        detector.save_config(os.path.join(artifacts_dir, CHANGE_ARTIFACT))
+
+    def score(self, items: list[tuple]) -> sp.csr_matrix:
+        """
+        Computes the feature vectors of a batch of (item1a, previous_item1a or None) pairs.
+        Returns a (len(items), len(self.columns)) CSR matrix ordered as self.columns.
+        """
+        texts = pd.Series([text for text, _ in items])
+        blocks = {}
+        if "linguistic" in self.groups:
+            blocks["linguistic"] = pd.DataFrame(self.engineer.compute_batch(texts.tolist()),
+                                                columns=LINGUISTIC_FEATURES).to_numpy(np.float64)
+        if "change" in self.groups:
+            blocks["change"] = pd.DataFrame([self.detector.compare(text, previous or '')
+                                             for text, previous in items],
+                                            columns=CHANGE_FEATURES).to_numpy(np.float64)
+        if "tfidf" in self.groups:
+            blocks["tfidf"] = self.tfidf.transform_sparse(texts)
+        if "embedding" in self.groups:
+            blocks["embedding"] = self.embedder.transform(texts).to_numpy(np.float64)
+        return sp.hstack([sp.csr_matrix(blocks[name]) for name in self.groups], format="csr")
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and scores them together in a worker thread.
+    A batch is flushed when it reaches max_batch_size or max_wait_ms after its first item.
+    If scoring a batch fails, its items are retried one by one so only the failing item errors.
+
+    :param score_fn: Function mapping a list of items to a matrix with one row per item
+    :param max_batch_size: Maximum number of items scored at once
+    :param max_wait_ms: Maximum time the first item of a batch waits for others
+    """
+    def __init__(self, score_fn, max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, item) -> Future:
+        """
+        Queues an item and returns a Future resolved with its feature row.
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, items: list):
+        rows = self.score_fn(items)
+        if rows.shape[0] != len(items):
+            raise RuntimeError(f"score_fn returned {rows.shape[0]} rows for {len(items)} items")
+        return rows
+
+    def _run(self) -> None:
+        while True:
+            # Drop items whose request already timed out and cancelled them
+            batch = [(item, future) for item, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                rows = self._score([item for item, _ in batch])
+            except Exception:
+                # Isolate the failing item(s) instead of failing the whole batch
+                for item, future in batch:
+                    try:
+                        future.set_result(self._score([item])[0])
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            for i, (_, future) in enumerate(batch):
+                future.set_result(rows[i])
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints:
+      GET  /health   -> {"status": "ok"}
+      GET  /columns  -> feature names, in the order of the returned vectors
+      POST /score    -> one filing or {"filings": [...]}; a filing gives "item1a" or the raw
+                        10-K "text", and optionally "previous_item1a" / "previous_text" for
+                        change features. Each result has its own "status"; scored rows are
+                        returned sparse as "indices" / "values", failures carry an "error".
+    """
+    server_version = "FilingScorer/1.0"
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _item1a(self, filing: dict, prefix: str = "") -> str:
+        """
+        Returns Item 1A, given directly or extracted from the raw filing, with whitespace
+        collapsed like the preprocessed training data.
+        Raises ValueError when no Item 1A can be found, since the artifacts were fitted on it.
+        """
+        if filing.get(prefix + "item1a"):
+            item1a = filing[prefix + "item1a"]
+            if not isinstance(item1a, str):
+                raise ValueError(f"'{prefix}item1a' must be a string")
+            sections = {"item1a": self.server.preprocessor.normalize_whitespace(item1a)}
+        else:
+            sections = self.server.preprocessor.extract_sections(filing.get(prefix + "text") or "")
+        return section_text(sections, require_item1a=True)
+
+    def _previous_item1a(self, filing: dict):
+        if filing.get("previous_item1a") or filing.get("previous_text"):
+            return self._item1a(filing, prefix="previous_")
+        return None
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/columns":
+            self._send_json(200, {"columns": self.server.scorer.columns})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _score_filing(self, filing: dict) -> tuple:
+        """
+        Validates a filing and queues it; returns (future, None) or (None, error result).
+        """
+        try:
+            if not isinstance(filing, dict):
+                raise ValueError("Each filing must be a JSON object")
+            item = (self._item1a(filing), self._previous_item1a(filing))
+        except ValueError as e:
+            return None, {"status": 400, "error": str(e)}
+        return self.server.batcher.submit(item), None
+
+    def _result(self, filing, future: Future, error: dict, deadline: float) -> dict:
+        """
+        Waits for one filing and formats its row, or the error that prevented scoring it.
+        """
+        filing_id = filing.get("filing_id") if isinstance(filing, dict) else None
+        if error is None:
+            try:
+                row = sp.csr_matrix(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                return {
+                    "filing_id": filing_id,
+                    "status": 200,
+                    "indices": row.indices.tolist(),
+                    # NaN is not valid JSON
+                    "values": [None if np.isnan(v) else float(v) for v in row.data],
+                }
+            except TimeoutError:
+                future.cancel()
+                error = {"status": 504, "error": "Scoring timed out"}
+            except ValueError as e:
+                # Invalid input detected while scoring (e.g. text above spaCy's max_length)
+                error = {"status": 400, "error": str(e)}
+            except Exception as e:
+                error = {"status": 500, "error": str(e)}
+        return {"filing_id": filing_id, **error}
+
+    def do_POST(self) -> None:
+        if self.path != "/score":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            filings = payload["filings"] if "filings" in payload else [payload]
+            if not isinstance(filings, list):
+                raise ValueError("'filings' must be a list")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        # Each filing gets its own status so one failure does not discard the others
+        queued = [self._score_filing(f) for f in filings]
+        deadline = time.monotonic() + self.server.request_timeout
+        results = [self._result(f, future, error, deadline)
+                   for f, (future, error) in zip(filings, queued)]
+        status = results[0]["status"] if len(results) == 1 else 200
+        self._send_json(status, {"n_features": len(self.server.scorer.columns), "results": results})
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the console quiet under load
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000,
+          artifacts_dir: str = DEFAULT_ARTIFACTS_DIR,
+          max_batch_size: int = 32, max_wait_ms: float = 10.0,
+          request_timeout: float = 60.0) -> None:
+    """
+    Loads the artifacts once and serves scoring requests until interrupted.
+    """
+    scorer = FeatureScorer(artifacts_dir)
+    # Warm up so the first request does not pay for lazy initialisation
+    scorer.score([("Warm up.", None)])
+    server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    server.scorer = scorer
+    server.preprocessor = Preprocessor()
+    server.batcher = MicroBatcher(scorer.score, max_batch_size, max_wait_ms)
+    server.request_timeout = request_timeout
+    print(f"[+] Scoring service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local feature scoring service for new 10-K filings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--artifacts-dir", default=DEFAULT_ARTIFACTS_DIR)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.artifacts_dir, args.max_batch_size, args.max_wait_ms,
+          args.request_timeout)
@@ -4,8 +4,10 @@
 Module for text vectorization and feature generation in preparation for SVM and embedding-based models.
 """
 import os
+import joblib
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.decomposition import PCA
@@ -18,6 +20,22 @@ except ImportError:
 _project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DEFAULT_TFIDF_OUT  = os.path.join(_project_root, "data", "processed", "tfidf_features.parquet")
 DEFAULT_EMBED_OUT  = os.path.join(_project_root, "data", "processed", "embedding_features.parquet")
+DEFAULT_TFIDF_MODEL = os.path.join(_project_root, "models", "tfidf.joblib")
+DEFAULT_EMBED_MODEL = os.path.join(_project_root, "models", "embedding")
+
+# Sentence-transformer models already loaded in this process, keyed by name or path
+_MODEL_CACHE = {}
+
+
+def _index_by_filing_id(df: pd.DataFrame, filing_ids) -> pd.DataFrame:
+    """
+    Replaces the row index by filing_id so saved features can be joined without relying on row order.
+    """
+    if filing_ids is None:
+        return df
+    if len(filing_ids) != len(df):
+        raise ValueError(f"Got {len(filing_ids)} filing_ids for {len(df)} feature rows")
+    return df.set_axis(pd.Index(list(filing_ids), name='filing_id'), axis=0)
 
 class TfidfFeatureExtractor:
     """
@@ -45,28 +63,84 @@ class TfidfFeatureExtractor:
         else:
             self.pca = None
 
-    def fit_transform(self, texts: pd.Series) -> pd.DataFrame:
+    def _to_frame(self, tfidf_matrix, index: pd.Index, fit: bool) -> pd.DataFrame:
         """
-        Fits the TF-IDF vectorizer on provided texts and returns a DataFrame of features.
+        Wraps a TF-IDF matrix in a DataFrame and applies PCA (fitting it if requested).
         """
-        tfidf_matrix = self.vectorizer.fit_transform(texts.fillna(''))
-        features = tfidf_matrix.toarray()
         df_feat = pd.DataFrame(
-            features,
-            index=texts.index,
+            tfidf_matrix.toarray(),
+            index=index,
             columns=self.vectorizer.get_feature_names_out()
         )
         if self.pca:
-            pca_scores = self.pca.fit_transform(df_feat)
-            cols = [f'pca_{i+1}' for i in range(self.pca_components)]
-            df_feat = pd.DataFrame(pca_scores, index=texts.index, columns=cols)
+            pca_scores = self.pca.fit_transform(df_feat) if fit else self.pca.transform(df_feat)
+            df_feat = pd.DataFrame(pca_scores, index=index, columns=self.feature_names())
         return df_feat
 
-    def save(self, df_feat: pd.DataFrame) -> None:
+    def feature_names(self) -> list[str]:
+        """
+        Names of the output columns (PCA components or vocabulary terms).
+        """
+        if self.pca:
+            return [f'pca_{i+1}' for i in range(self.pca_components)]
+        return list(self.vectorizer.get_feature_names_out())
+
+    def fit_transform(self, texts: pd.Series) -> pd.DataFrame:
+        """
+        Fits the TF-IDF vectorizer on provided texts and returns a DataFrame of features.
+        """
+        tfidf_matrix = self.vectorizer.fit_transform(texts.fillna(''))
+        return self._to_frame(tfidf_matrix, texts.index, fit=True)
+
+    def transform(self, texts: pd.Series) -> pd.DataFrame:
         """
-        Saves the TF-IDF (or PCA-reduced) features to Parquet.
+        Projects new texts on the already fitted vocabulary (and PCA), without refitting.
+        """
+        tfidf_matrix = self.vectorizer.transform(texts.fillna(''))
+        return self._to_frame(tfidf_matrix, texts.index, fit=False)
+
+    def transform_sparse(self, texts: pd.Series) -> sp.csr_matrix:
+        """
+        Same as transform() but keeps the TF-IDF matrix sparse (PCA scores are returned as CSR too).
+        """
+        tfidf_matrix = self.vectorizer.transform(texts.fillna(''))
+        if self.pca:
+            return sp.csr_matrix(self._to_frame(tfidf_matrix, texts.index, fit=False).to_numpy())
+        return sp.csr_matrix(tfidf_matrix)
+
+    def save_model(self, path: str = DEFAULT_TFIDF_MODEL) -> None:
+        """
+        Persists the fitted vectorizer (and PCA) so new filings can be scored with transform().
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump({
+            'max_features': self.max_features,
+            'pca_components': self.pca_components,
+            'vectorizer': self.vectorizer,
+            'pca': self.pca,
+        }, path)
+        print(f"[✓] Saved TF-IDF model to {path}")
+
+    @classmethod
+    def load_model(cls, path: str = DEFAULT_TFIDF_MODEL,
+                   output_file: str = DEFAULT_TFIDF_OUT) -> "TfidfFeatureExtractor":
+        """
+        Restores an extractor saved with save_model(), ready for transform().
+        """
+        state = joblib.load(path)
+        extractor = cls(max_features=state['max_features'],
+                        pca_components=state['pca_components'],
+                        output_file=output_file)
+        extractor.vectorizer = state['vectorizer']
+        extractor.pca = state['pca']
+        return extractor
+
+    def save(self, df_feat: pd.DataFrame, filing_ids=None) -> None:
+        """
+        Saves the TF-IDF (or PCA-reduced) features to Parquet, indexed by filing_ids when given.
         """
         os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+        df_feat = _index_by_filing_id(df_feat, filing_ids)
         df_feat.to_parquet(self.output_file, index=True)
         print(f"[✓] Saved TF-IDF features to {self.output_file}")
 
@@ -74,18 +148,24 @@ class EmbeddingFeatureExtractor:
     """
     Generates fixed-size sentence embeddings using a pre-trained model.
     Falls back to average word embeddings if SentenceTransformer unavailable.
+
+    The model is loaded once per process and shared between instances; model_name
+    may also be a local directory written by save_model().
     """
     def __init__(self,
                  model_name: str = 'all-MiniLM-L6-v2',
-                 output_file: str = DEFAULT_EMBED_OUT):
+                 output_file: str = DEFAULT_EMBED_OUT,
+                 show_progress_bar: bool = True):
         self.model_name = model_name
         self.output_file = output_file
-        if SentenceTransformer:
-            self.model = SentenceTransformer(self.model_name)
-        else:
+        self.show_progress_bar = show_progress_bar
+        if not SentenceTransformer:
             raise ImportError(
                 'sentence-transformers not installed; please pip install sentence-transformers'
             )
+        if self.model_name not in _MODEL_CACHE:
+            _MODEL_CACHE[self.model_name] = SentenceTransformer(self.model_name)
+        self.model = _MODEL_CACHE[self.model_name]
 
     def transform(self, texts: pd.Series) -> pd.DataFrame:
         """
@@ -94,16 +174,25 @@ class EmbeddingFeatureExtractor:
         embeddings = self.model.encode(
             texts.fillna('').tolist(),
             convert_to_numpy=True,
-            show_progress_bar=True
+            show_progress_bar=self.show_progress_bar
         )
         cols = [f'emb_{i+1}' for i in range(embeddings.shape[1])]
         df_embed = pd.DataFrame(embeddings, index=texts.index, columns=cols)
         return df_embed
 
-    def save(self, df_embed: pd.DataFrame) -> None:
+    def save(self, df_embed: pd.DataFrame, filing_ids=None) -> None:
         """
-        Saves the embedding features to Parquet.
+        Saves the embedding features to Parquet, indexed by filing_ids when given.
         """
         os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+        df_embed = _index_by_filing_id(df_embed, filing_ids)
         df_embed.to_parquet(self.output_file, index=True)
         print(f"[✓] Saved embedding features to {self.output_file}")
+
+    def save_model(self, path: str = DEFAULT_EMBED_MODEL) -> None:
+        """
+        Saves the model locally so later processes load it from disk instead of the hub.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.model.save(path)
+        print(f"[✓] Saved embedding model to {path}")